@@ -0,0 +1,65 @@
+import queue
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import models
+
+# ==============================
+# Shared Inference Service
+# ==============================
+class ResultRelay(QObject):
+    # Emitted from the service thread, delivered queued on the GUI thread that owns the relay
+    result_ready = pyqtSignal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.result_ready.connect(self.deliver)
+
+    def deliver(self, callback, preds):
+        callback(preds)
+
+
+class InferenceService:
+    """One inference thread shared by the live and MP4 pages.
+
+    Batches are queued with submit() and classified in order; the callback
+    gets the labels (or None if inference failed) on the Qt GUI thread.
+    """
+
+    def __init__(self, max_pending=4):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.relay = ResultRelay()
+        models.load_models_async()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, batch, callback, block=False):
+        # A full queue means inference is behind, drop the batch rather than lag further
+        try:
+            self.queue.put((batch, callback), block=block)
+            return True
+        except queue.Full:
+            return False
+
+    def run(self):
+        ready = models.wait_for_models()
+        while True:
+            batch, callback = self.queue.get()
+            preds = None
+            if ready:
+                try:
+                    preds = models.classify(models.extract_features(batch))
+                except Exception as e:
+                    print(f"Prediction error: {e}")
+            self.relay.result_ready.emit(callback, preds)
+
+
+_service = None
+
+
+def get_inference_service():
+    # Created on first use from the GUI thread so the relay lives there
+    global _service
+    if _service is None:
+        _service = InferenceService()
+    return _service
@@ -1,24 +1,27 @@
+import sys
 import cv2
 import numpy as np
-import joblib
 from PyQt5.QtWidgets import (
-    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QFrame
+    QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QFrame, QStackedWidget
 )
-from PyQt5.QtGui import QImage, QPixmap, QColor
-from PyQt5.QtCore import QTimer, Qt
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-from tensorflow.keras.applications import MobileNetV2
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+import models
+from inference_service import get_inference_service
+from preprocessing_fast import preprocess_frame, fit_rgb, DISPLAY_SIZE
 
-# ==============================
-# Load Model & Feature Extractor
-# ==============================
-try:
-    clf = joblib.load("models/stanford40_activity_clf.pkl")
-    feature_extractor = MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(128,128,3))
-except:
-    print("Warning: Model files not found. Please ensure models/stanford40_activity_clf.pkl exists.")
-    clf = None
-    feature_extractor = None
+# Leave most cores to the TFLite interpreter's thread pool
+cv2.setNumThreads(2)
+
+# Native capture backend per platform instead of OpenCV's auto-selection
+if sys.platform.startswith("linux"):
+    CAPTURE_BACKEND = cv2.CAP_V4L2
+elif sys.platform == "darwin":
+    CAPTURE_BACKEND = cv2.CAP_AVFOUNDATION
+elif sys.platform == "win32":
+    CAPTURE_BACKEND = cv2.CAP_DSHOW
+else:
+    CAPTURE_BACKEND = cv2.CAP_ANY
 
 # ==============================
 # Custom Styled Widgets
@@ -126,14 +129,8 @@ class VideoFrame(QFrame):
                 padding: 10px;
             }
         """)
-        
-        # Add shadow effect
-        from PyQt5.QtWidgets import QGraphicsDropShadowEffect
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(20)
-        shadow.setColor(QColor(0, 0, 0, 80))
-        shadow.setOffset(5, 5)
-        self.setGraphicsEffect(shadow)
+        # No QGraphicsDropShadowEffect here: it re-blurs the whole frame on
+        # every repaint, and the video inside repaints at camera rate
 
 class DashboardPanel(QFrame):
     def __init__(self):
@@ -150,24 +147,191 @@ class DashboardPanel(QFrame):
                 padding: 20px;
             }
         """)
-        
-        # Add shadow effect
-        from PyQt5.QtWidgets import QGraphicsDropShadowEffect
-        shadow = QGraphicsDropShadowEffect()
-        shadow.setBlurRadius(15)
-        shadow.setColor(QColor(52, 152, 219, 40))
-        shadow.setOffset(3, 3)
-        self.setGraphicsEffect(shadow)
+
+# ==============================
+# Capture + Inference Thread
+# ==============================
+INFERENCE_INTERVAL = 6  # run the model on every 6th frame (~5 Hz at 30 fps)
+BATCH_SIZE = 4  # sampled frames accumulated per feature extractor call
+MOTION_THRESHOLD = 4.0  # mean abs grey-level difference below which the scene counts as static
+
+class InferenceWorker(QThread):
+    frame_ready = pyqtSignal(object, object)  # this worker (owns display_pending), RGB frame for display
+    predictions_ready = pyqtSignal(object)  # labels for one batch of frames
+    prediction_failed = pyqtSignal()
+    camera_unavailable = pyqtSignal()
+
+    def __init__(self, camera_index=0):
+        super().__init__()
+        self.camera_index = camera_index
+        self.is_running = True
+        self.service = get_inference_service()
+        self.batch_buf = np.empty((BATCH_SIZE, 128, 128, 3), dtype=np.float32)
+        self.raw_batch_buf = np.empty((BATCH_SIZE, 128, 128, 3), dtype=np.uint8)
+        self.batch_idx = 0
+        self.frame_counter = 0
+        self.last_preds = None
+        # 64x64 grey thumbnails for the motion gate
+        self.small_bgr = np.empty((64, 64, 3), dtype=np.uint8)
+        self.gray = np.empty((64, 64), dtype=np.uint8)
+        self.prev_gray = np.empty_like(self.gray)
+        self.gray_diff = np.empty_like(self.gray)
+        # Capture and display buffers live as long as the worker, so neither
+        # cap.read nor the QImage built by the page allocate per frame
+        self.bgr_frame = np.empty((480, 640, 3), dtype=np.uint8)
+        self.rgb_frame = np.empty_like(self.bgr_frame)
+        self.display_pending = False
+
+    def run(self):
+        cap = cv2.VideoCapture(self.camera_index, CAPTURE_BACKEND)
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            self.camera_unavailable.emit()
+            return
+        # A one-frame driver queue makes read() return the newest frame, not a stale one
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        # Pin the capture format instead of leaving it to backend negotiation,
+        # MJPG keeps USB bandwidth low at 640x480 @ 30 fps
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        cap.set(cv2.CAP_PROP_FPS, 30)
+
+        while self.is_running:
+            ret, frame = cap.read(self.bgr_frame)
+            if not ret:
+                break
+            # OpenCV returns a new array if the camera isn't 640x480, adopt it
+            self.bgr_frame = frame
+
+            # Preprocess and predict at a lower rate than the display, the
+            # on-screen label keeps the last batch's result in between
+            sample = self.frame_counter % INFERENCE_INTERVAL == 0
+            self.frame_counter += 1
+            if sample and models.models_ready():
+                try:
+                    if self.scene_is_static(frame):
+                        if self.batch_idx > 0:
+                            # The queued frames show the scene that just went still, so
+                            # classify them now rather than hold the previous batch's label
+                            self.submit_batch()
+                        else:
+                            # Nothing moved since the last inferred frame, reuse its label
+                            self.predictions_ready.emit(self.last_preds[-1:])
+                    else:
+                        if models.raw_input:
+                            # Scaling is folded into the int8 graph, only resize
+                            cv2.resize(frame, (128, 128), dst=self.raw_batch_buf[self.batch_idx])
+                        else:
+                            # Resize + MobileNetV2 scaling straight into this frame's batch slot
+                            preprocess_frame(frame, self.batch_buf[self.batch_idx])
+                        self.batch_idx += 1
+                        if self.batch_idx == BATCH_SIZE:
+                            self.submit_batch()
+                except Exception as e:
+                    print(f"Prediction error: {e}")
+                    self.prediction_failed.emit()
+
+            # The RGB buffer is shared with the page, so only refill it once the
+            # previous frame has been painted and drop display frames meanwhile
+            if not self.display_pending:
+                # Fit other camera resolutions to the video label here, so the GUI thread never scales
+                self.rgb_frame = fit_rgb(frame, DISPLAY_SIZE, dst=self.rgb_frame)
+                self.display_pending = True
+                self.frame_ready.emit(self, self.rgb_frame)
+
+        cap.release()
+
+    def submit_batch(self):
+        batch = self.raw_batch_buf if models.raw_input else self.batch_buf
+        n = self.batch_idx
+        # Always submit BATCH_SIZE frames so the interpreter and XLA keep one input
+        # shape; the unused slots of a partial batch hold stale frames whose labels are
+        # dropped. The buffer is refilled while the service runs, hand it a copy.
+        self.service.submit(
+            batch.copy(), lambda preds: self.on_predictions(None if preds is None else preds[:n]))
+        self.batch_idx = 0
+
+    def on_predictions(self, preds):
+        # Called on the GUI thread by the inference service
+        if preds is None:
+            self.prediction_failed.emit()
+            return
+        self.last_preds = preds
+        self.predictions_ready.emit(preds)
+
+    def scene_is_static(self, frame):
+        cv2.resize(frame, (64, 64), dst=self.small_bgr)
+        cv2.cvtColor(self.small_bgr, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.last_preds is not None:
+            cv2.absdiff(self.gray, self.prev_gray, dst=self.gray_diff)
+            if self.gray_diff.mean() < MOTION_THRESHOLD:
+                return True
+        # This frame goes to the model, later frames are compared against it
+        np.copyto(self.prev_gray, self.gray)
+        return False
+
+    def stop(self):
+        self.is_running = False
+        self.wait()
 
 # ==============================
 # Live Video Page
 # ==============================
 class LiveVideoPage(QWidget):
+    # Prediction stylesheets, each applied once to its own pre-built label
+    ACTIVE_PRED_STYLE = """
+        QLabel {
+            font-size: 24px;
+            font-weight: bold;
+            color: #27AE60;
+            background: rgba(39, 174, 96, 0.1);
+            border-radius: 20px;
+            padding: 15px;
+            border: 3px solid #27AE60;
+        }
+    """
+    IDLE_PRED_STYLE = """
+        QLabel {
+            font-size: 24px;
+            font-weight: bold;
+            color: #E74C3C;
+            background: rgba(231, 76, 60, 0.1);
+            border-radius: 20px;
+            padding: 15px;
+            border: 3px solid #E74C3C;
+        }
+    """
+    ACTIVE_ALERT_STYLE = """
+        QLabel {
+            font-size: 18px;
+            font-weight: bold;
+            color: #27AE60;
+            background: rgba(39, 174, 96, 0.1);
+            border: 2px solid #27AE60;
+            border-radius: 15px;
+            padding: 12px;
+        }
+    """
+    IDLE_ALERT_STYLE = """
+        QLabel {
+            font-size: 18px;
+            font-weight: bold;
+            color: #E74C3C;
+            background: rgba(231, 76, 60, 0.1);
+            border: 2px solid #E74C3C;
+            border-radius: 15px;
+            padding: 12px;
+        }
+    """
+
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
         self.active_count = 0
         self.idle_count = 0
+        self._current_state = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -199,10 +363,9 @@ class LiveVideoPage(QWidget):
         
         video_layout.addWidget(self.video_label, alignment=Qt.AlignCenter)
         
-        # Prediction display
-        self.pred_label = QLabel("⏳ Initializing...")
-        self.pred_label.setAlignment(Qt.AlignCenter)
-        self.pred_label.setStyleSheet("""
+        # Prediction display - one pre-styled label per state, flipped through a stack
+        self.pred_stack = QStackedWidget()
+        self.pred_init_label = self.add_state_label(self.pred_stack, "⏳ Loading model...", """
             QLabel {
                 font-size: 24px;
                 font-weight: bold;
@@ -213,6 +376,9 @@ class LiveVideoPage(QWidget):
                 border: 3px solid #BDC3C7;
             }
         """)
+        self.pred_active_label = self.add_state_label(self.pred_stack, "🎯 ACTIVE WORKER ✅", self.ACTIVE_PRED_STYLE)
+        self.pred_idle_label = self.add_state_label(self.pred_stack, "⚠️ IDLE WORKER DETECTED ❌", self.IDLE_PRED_STYLE)
+        self.pred_error_label = self.add_state_label(self.pred_stack, "❌ Prediction Error", self.IDLE_PRED_STYLE)
         
         # Back button
         self.back_btn = StyledButton("🏠 Back to Home", "#95A5A6", "#7F8C8D", "medium")
@@ -220,7 +386,7 @@ class LiveVideoPage(QWidget):
         
         left_panel.addWidget(video_label)
         left_panel.addWidget(self.video_container)
-        left_panel.addWidget(self.pred_label)
+        left_panel.addWidget(self.pred_stack)
         left_panel.addWidget(self.back_btn, alignment=Qt.AlignCenter)
         
         # Right panel - Dashboard
@@ -237,19 +403,10 @@ class LiveVideoPage(QWidget):
         dashboard_layout.setSpacing(15)
         
         # Status indicators
-        self.alert_label = QLabel("🟢 System Ready")
-        self.alert_label.setAlignment(Qt.AlignCenter)
-        self.alert_label.setStyleSheet("""
-            QLabel {
-                font-size: 18px;
-                font-weight: bold;
-                color: #27AE60;
-                background: rgba(39, 174, 96, 0.1);
-                border: 2px solid #27AE60;
-                border-radius: 15px;
-                padding: 12px;
-            }
-        """)
+        self.alert_stack = QStackedWidget()
+        self.alert_ready_label = self.add_state_label(self.alert_stack, "🟢 System Ready", self.ACTIVE_ALERT_STYLE)
+        self.alert_active_label = self.add_state_label(self.alert_stack, "🟢 Status: Normal - Worker Active", self.ACTIVE_ALERT_STYLE)
+        self.alert_idle_label = self.add_state_label(self.alert_stack, "🔴 ALERT: Worker Idle - Action Required!", self.IDLE_ALERT_STYLE)
         
         # Statistics
         stats_container = QFrame()
@@ -277,7 +434,7 @@ class LiveVideoPage(QWidget):
         stats_layout.addWidget(self.idle_stats)
         
         # Add widgets to dashboard
-        dashboard_layout.addWidget(self.alert_label)
+        dashboard_layout.addWidget(self.alert_stack)
         dashboard_layout.addWidget(stats_container)
         dashboard_layout.addStretch()
         
@@ -289,127 +446,97 @@ class LiveVideoPage(QWidget):
         main_layout.addLayout(right_panel, 1)
         self.setLayout(main_layout)
 
-        # Camera Timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.cap = None
+        # Camera Worker - capture + inference run off the UI thread, this page only paints.
+        # It only runs while the page is visible, see showEvent/hideEvent
+        self.worker = None
+
+    def add_state_label(self, stack, text, style):
+        label = QLabel(text)
+        label.setAlignment(Qt.AlignCenter)
+        label.setStyleSheet(style)
+        stack.addWidget(label)
+        return label
+
+    def showEvent(self, event):
+        super().showEvent(event)
         self.start_camera()
 
-    def start_camera(self):
-        self.cap = cv2.VideoCapture(0)
-        if self.cap.isOpened():
-            self.timer.start(30)
-        else:
-            self.video_label.setText("📷 Camera Not Available")
-            self.video_label.setStyleSheet("""
-                QLabel {
-                    border: 2px solid #BDC3C7;
-                    border-radius: 15px;
-                    background: #34495E;
-                    color: white;
-                    font-size: 18px;
-                    font-weight: bold;
-                }
-            """)
+    def hideEvent(self, event):
+        # Release the webcam for the home page preview and stop decoding frames nobody sees
+        super().hideEvent(event)
+        self.stop_camera()
 
-    def update_frame(self):
-        if not self.cap or not self.cap.isOpened():
-            return
-            
-        ret, frame = self.cap.read()
-        if not ret:
+    def start_camera(self):
+        if self.worker:
             return
+        # TF + MobileNetV2 load in the background, the worker starts predicting once they're ready
+        models.load_models_async()
+        self.worker = InferenceWorker(0)
+        self.worker.frame_ready.connect(self.display_frame)
+        self.worker.predictions_ready.connect(self.show_predictions)
+        self.worker.prediction_failed.connect(self.show_prediction_error)
+        self.worker.camera_unavailable.connect(self.show_camera_unavailable)
+        self.worker.start()
+
+    def stop_camera(self):
+        if self.worker:
+            # Disconnect first so nothing the stopped worker emits reaches the page
+            self.worker.frame_ready.disconnect()
+            self.worker.predictions_ready.disconnect()
+            self.worker.prediction_failed.disconnect()
+            self.worker.camera_unavailable.disconnect()
+            self.worker.stop()
+            self.worker = None
 
-        # Preprocess and predict
-        if clf and feature_extractor:
-            try:
-                img = cv2.resize(frame, (128, 128))
-                x = np.expand_dims(img.astype("float32"), axis=0)
-                x = preprocess_input(x)
-                features = feature_extractor.predict(x, verbose=0)
-                pred = clf.predict(features)[0]
-                
-                # Update dashboard
-                if pred == 1:  # Active
-                    self.pred_label.setText("🎯 ACTIVE WORKER ✅")
-                    self.pred_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 24px;
-                            font-weight: bold;
-                            color: #27AE60;
-                            background: rgba(39, 174, 96, 0.1);
-                            border-radius: 20px;
-                            padding: 15px;
-                            border: 3px solid #27AE60;
-                        }
-                    """)
-                    self.alert_label.setText("🟢 Status: Normal - Worker Active")
-                    self.alert_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 18px;
-                            font-weight: bold;
-                            color: #27AE60;
-                            background: rgba(39, 174, 96, 0.1);
-                            border: 2px solid #27AE60;
-                            border-radius: 15px;
-                            padding: 12px;
-                        }
-                    """)
-                    self.active_count += 1
-                else:  # Idle
-                    self.pred_label.setText("⚠️ IDLE WORKER DETECTED ❌")
-                    self.pred_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 24px;
-                            font-weight: bold;
-                            color: #E74C3C;
-                            background: rgba(231, 76, 60, 0.1);
-                            border-radius: 20px;
-                            padding: 15px;
-                            border: 3px solid #E74C3C;
-                        }
-                    """)
-                    self.alert_label.setText("🔴 ALERT: Worker Idle - Action Required!")
-                    self.alert_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 18px;
-                            font-weight: bold;
-                            color: #E74C3C;
-                            background: rgba(231, 76, 60, 0.1);
-                            border: 2px solid #E74C3C;
-                            border-radius: 15px;
-                            padding: 12px;
-                        }
-                    """)
-                    self.idle_count += 1
-                
-                # Update statistics
-                self.active_stats.setText(f"🟢 Active: {self.active_count}")
-                self.idle_stats.setText(f"🔴 Idle: {self.idle_count}")
-                
-            except Exception as e:
-                print(f"Prediction error: {e}")
-                self.pred_label.setText("❌ Prediction Error")
-                self.pred_label.setStyleSheet("""
-                    QLabel {
-                        font-size: 24px;
-                        font-weight: bold;
-                        color: #E74C3C;
-                        background: rgba(231, 76, 60, 0.1);
-                        border-radius: 20px;
-                        padding: 15px;
-                        border: 3px solid #E74C3C;
-                    }
-                """)
-
-        # Show Video
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    def show_camera_unavailable(self):
+        self.video_label.setText("📷 Camera Not Available")
+        self.video_label.setStyleSheet("""
+            QLabel {
+                border: 2px solid #BDC3C7;
+                border-radius: 15px;
+                background: #34495E;
+                color: white;
+                font-size: 18px;
+                font-weight: bold;
+            }
+        """)
+
+    def display_frame(self, worker, rgb):
+        # A frame queued before its worker was stopped only releases the buffer
+        if worker is not self.worker:
+            worker.display_pending = False
+            return
         h, w, ch = rgb.shape
         qimg = QImage(rgb.data, w, h, ch*w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled_pixmap = pixmap.scaled(640, 480, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.video_label.setPixmap(scaled_pixmap)
+        # The worker already fitted the frame to the label (DISPLAY_SIZE)
+        self.video_label.setPixmap(QPixmap.fromImage(qimg))
+        # QPixmap.fromImage copied the pixels, the worker may reuse its buffer
+        worker.display_pending = False
+
+    def show_prediction_error(self):
+        self.pred_stack.setCurrentWidget(self.pred_error_label)
+        self._current_state = None
+
+    def show_predictions(self, preds):
+        # Counters include every frame in the batch, the label shows the latest one
+        active = int(np.count_nonzero(preds == 1))
+        self.active_count += active
+        self.idle_count += len(preds) - active
+
+        # Update dashboard only when the predicted state flips
+        pred = int(preds[-1])
+        if pred != self._current_state:
+            self._current_state = pred
+            if pred == 1:  # Active
+                self.pred_stack.setCurrentWidget(self.pred_active_label)
+                self.alert_stack.setCurrentWidget(self.alert_active_label)
+            else:  # Idle
+                self.pred_stack.setCurrentWidget(self.pred_idle_label)
+                self.alert_stack.setCurrentWidget(self.alert_idle_label)
+        
+        # Update statistics
+        self.active_stats.setText(f"🟢 Active: {self.active_count}")
+        self.idle_stats.setText(f"🔴 Idle: {self.idle_count}")
 
     def closeEvent(self, event):
-        if self.cap:
-            self.cap.release()
+        self.stop_camera()
@@ -246,12 +246,31 @@ class HomePage(QWidget):
         main_layout.addStretch()
         self.setLayout(main_layout)
 
-        # Webcam Preview Timer
-        self.cap = cv2.VideoCapture(0)
+        # Webcam Preview Timer - only runs while the page is visible, see showEvent/hideEvent
+        self.cap = None
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_preview)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.start_preview()
+
+    def hideEvent(self, event):
+        # Hand the webcam over to the live tracking page instead of competing for it
+        super().hideEvent(event)
+        self.stop_preview()
+
+    def start_preview(self):
+        if self.cap is None:
+            self.cap = cv2.VideoCapture(0)
         self.timer.start(50)
 
+    def stop_preview(self):
+        self.timer.stop()
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
     def update_preview(self):
         ret, frame = self.cap.read()
         if ret:
@@ -277,8 +296,7 @@ class HomePage(QWidget):
             """)
 
     def closeEvent(self, event):
-        if self.cap:
-            self.cap.release()
+        self.stop_preview()
 
 # ==============================
 # Run Application
@@ -0,0 +1,223 @@
+import os
+import threading
+import numpy as np
+
+# ==============================
+# Load Model & Feature Extractor
+# ==============================
+# Loaded once per process and shared by the live and MP4 pages. TensorFlow and
+# the classifier are only imported on first use so the main window comes up
+# without waiting for the TF graph build.
+TFLITE_MODEL_PATH = "models/mobilenet_fe.tflite"
+INT8_TFLITE_MODEL_PATH = "models/mobilenet_fe_int8_raw.tflite"
+# Saved as plain .npy so the images can be memory-mapped instead of loaded whole
+DATASET_X_PATH = "dataset/stanford40_X.npy"
+DATASET_Y_PATH = "dataset/stanford40_y.npy"
+MIN_INT8_AGREEMENT = 0.95  # fraction of held-out labels the int8 model must reproduce
+WARMUP_BATCH_SIZES = (1, 4)  # MP4 page frames and live page batches
+
+clf = None
+clf_weights = None
+clf_bias = 0.0
+interpreter = None
+feature_extractor = None
+infer_fn = None  # traced call of feature_extractor, used instead of Model.predict
+raw_input = False  # True when the extractor takes raw uint8 pixels instead of x / 127.5 - 1
+
+def build_backbone():
+    from tensorflow.keras.applications import MobileNetV2
+    return MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(128,128,3))
+
+def build_raw_input_backbone():
+    import tensorflow as tf
+    # MobileNetV2 preprocessing as the first layer, so after quantization the
+    # uint8 input tensor is fed raw 0-255 pixels and the scaling folds into the first conv
+    inputs = tf.keras.Input(shape=(128,128,3))
+    x = tf.keras.layers.Rescaling(1.0 / 127.5, offset=-1.0)(inputs)
+    return tf.keras.Model(inputs, build_backbone()(x))
+
+def build_gpu_backbone():
+    from tensorflow.keras import mixed_precision
+    # FP16 convolutions run on tensor cores; pooling/outputs are cast back to float32 on read
+    mixed_precision.set_global_policy("mixed_float16")
+    try:
+        return build_backbone()
+    finally:
+        mixed_precision.set_global_policy("float32")
+
+def build_inference_function(model, jit_compile=True):
+    import tensorflow as tf
+    # One concrete graph for any batch size, so calls skip Model.predict's
+    # per-call data adapter/callback setup and never retrace. With XLA the
+    # conv/BN/ReLU chains are fused and compiled once per batch shape seen.
+    concrete = tf.function(
+        lambda x: model(x, training=False),
+        input_signature=[tf.TensorSpec([None, 128, 128, 3], tf.float32)],
+        jit_compile=jit_compile,
+    ).get_concrete_function()
+    infer = lambda x: concrete(tf.constant(x)).numpy()
+    # Compile the batch shapes the pages use now rather than on the first frames
+    for n in WARMUP_BATCH_SIZES:
+        infer(np.zeros((n, 128, 128, 3), dtype=np.float32))
+    return infer
+
+def load_interpreter(model_path):
+    import tensorflow as tf
+    # The default op resolver applies the XNNPACK delegate for both float and int8 kernels
+    interp = tf.lite.Interpreter(model_path=model_path, num_threads=os.cpu_count())
+    interp.allocate_tensors()
+    return interp
+
+def has_raw_pixel_input(interp):
+    # run_interpreter writes 0-255 pixels into the uint8 input as-is, which is only
+    # right if the converter quantized that input with scale 1 and zero point 0
+    scale, zero_point = interp.get_input_details()[0]["quantization"]
+    return bool(np.isclose(scale, 1.0)) and zero_point == 0
+
+def run_interpreter(interp, x):
+    """Invoke a TFLite feature extractor on a (N, 128, 128, 3) batch in its input dtype."""
+    input_detail = interp.get_input_details()[0]
+    if input_detail["shape"][0] != len(x):
+        interp.resize_tensor_input(input_detail["index"], x.shape)
+        interp.allocate_tensors()
+    # Write straight into the interpreter's input tensor instead of copying via set_tensor
+    interp.tensor(input_detail["index"])()[:] = x
+    interp.invoke()
+    return interp.get_tensor(interp.get_output_details()[0]["index"])
+
+def convert_float_extractor(model_path=TFLITE_MODEL_PATH):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(build_backbone())
+    with open(model_path, "wb") as f:
+        f.write(converter.convert())
+
+def convert_int8_extractor(classifier, model_path=INT8_TFLITE_MODEL_PATH, n_calib=100, n_val=200):
+    """Post-training int8 quantization, saved only if classifier labels agree with the float model."""
+    import tensorflow as tf
+    X = np.load(DATASET_X_PATH, mmap_mode="r")
+    calib = X[:n_calib].astype(np.float32)
+    held_out = np.asarray(X[n_calib:n_calib + n_val])
+    if len(held_out) == 0:
+        print(f"Warning: need more than {n_calib} images to validate the int8 feature extractor, keeping float model.")
+        return False
+
+    base_model = build_raw_input_backbone()
+    converter = tf.lite.TFLiteConverter.from_keras_model(base_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: ([x[None]] for x in calib)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.float32
+    tflite_model = converter.convert()
+
+    # Quantized MobileNet can regress accuracy, compare labels on frames not used for calibration
+    interp = tf.lite.Interpreter(model_content=tflite_model, num_threads=os.cpu_count())
+    interp.allocate_tensors()
+    if not has_raw_pixel_input(interp):
+        print("Warning: int8 feature extractor input is not quantized as raw pixels, keeping float model.")
+        return False
+    float_preds = classifier.predict(base_model.predict(held_out.astype(np.float32), verbose=0))
+    int8_preds = classifier.predict(run_interpreter(interp, held_out))
+    agreement = float(np.mean(float_preds == int8_preds))
+    if agreement < MIN_INT8_AGREEMENT:
+        print(f"Warning: int8 feature extractor agrees on only {agreement:.1%} of held-out frames, keeping float model.")
+        return False
+
+    with open(model_path, "wb") as f:
+        f.write(tflite_model)
+    return True
+
+def load_tflite_extractor():
+    # Prefer the int8 model train_model.py exported and validated; the app never
+    # quantizes itself, so a rejected int8 model costs nothing at startup
+    if os.path.exists(INT8_TFLITE_MODEL_PATH):
+        interp = load_interpreter(INT8_TFLITE_MODEL_PATH)
+        if has_raw_pixel_input(interp):
+            return interp
+        print("Warning: int8 feature extractor input is not quantized as raw pixels, using float TFLite model.")
+    if not os.path.exists(TFLITE_MODEL_PATH):
+        convert_float_extractor()
+    return load_interpreter(TFLITE_MODEL_PATH)
+
+def _load_models():
+    global clf, clf_weights, clf_bias, interpreter, feature_extractor, infer_fn, raw_input
+    import joblib
+    import tensorflow as tf
+    try:
+        clf = joblib.load("models/stanford40_activity_clf.pkl")
+    except:
+        print("Warning: Model files not found. Please ensure models/stanford40_activity_clf.pkl exists.")
+        clf = None
+
+    # A binary linear classifier is a single dot product, hoist its weights out of sklearn
+    if clf is not None and hasattr(clf, "coef_") and len(clf.classes_) == 2:
+        clf_weights = clf.coef_.astype(np.float32).ravel()
+        clf_bias = float(clf.intercept_[0])
+
+    if clf is not None:
+        if tf.config.list_physical_devices("GPU"):
+            # TFLite only runs on the CPU, so with a CUDA GPU visible keep the Keras model on the GPU
+            feature_extractor = build_gpu_backbone()
+        else:
+            try:
+                interpreter = load_tflite_extractor()
+                raw_input = interpreter.get_input_details()[0]["dtype"] == np.uint8
+            except Exception as e:
+                # Fall back to the float Keras model if TFLite conversion is unavailable
+                print(f"Warning: TFLite feature extractor unavailable ({e}), using Keras MobileNetV2.")
+                interpreter = None
+                feature_extractor = build_backbone()
+        if feature_extractor is not None:
+            try:
+                infer_fn = build_inference_function(feature_extractor)
+            except Exception as e:
+                print(f"Warning: XLA compilation failed ({e}), running the feature extractor without it.")
+                infer_fn = build_inference_function(feature_extractor, jit_compile=False)
+
+_load_lock = threading.Lock()
+_load_started = False
+_loaded = threading.Event()
+
+def load_models_async():
+    """Start loading the classifier and feature extractor on a background thread, once."""
+    global _load_started
+    with _load_lock:
+        if _load_started:
+            return
+        _load_started = True
+
+    def load():
+        try:
+            _load_models()
+        finally:
+            _loaded.set()
+    threading.Thread(target=load, daemon=True).start()
+
+def models_ready():
+    """True once loading has finished and a usable classifier + extractor exist."""
+    return _loaded.is_set() and clf is not None and (interpreter is not None or infer_fn is not None)
+
+def wait_for_models():
+    load_models_async()
+    _loaded.wait()
+    return models_ready()
+
+def classify(features):
+    """Label a (N, 1280) feature batch, skipping sklearn's per-call input validation."""
+    if clf_weights is None:
+        return clf.predict(features)
+    return clf.classes_[(features @ clf_weights + clf_bias > 0).astype(np.intp)]
+
+# The interpreter is not thread-safe and both pages may call in from different threads
+_extract_lock = threading.Lock()
+
+def extract_features(x):
+    """Run the MobileNetV2 backbone on a (N, 128, 128, 3) batch of resized BGR frames.
+
+    The batch holds raw uint8 pixels when raw_input is set, otherwise float32
+    values already scaled with x / 127.5 - 1.
+    """
+    with _extract_lock:
+        if interpreter is not None:
+            return run_interpreter(interpreter, x)
+        return infer_fn(x).astype(np.float32, copy=False)
@@ -1,30 +1,46 @@
+import queue
+import threading
 import cv2
 import numpy as np
-import joblib
 from PyQt5.QtWidgets import (
     QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout, QFrame, QFileDialog,
     QProgressBar, QSlider, QHBoxLayout
 )
 from PyQt5.QtGui import QImage, QPixmap, QColor
 from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
-from tensorflow.keras.applications import MobileNetV2
+import models
+from preprocessing_fast import preprocess_frame, fit_rgb, DISPLAY_SIZE
+from inference_service import get_inference_service
 
-# ==============================
-# Load Model & Feature Extractor
-# ==============================
-try:
-    clf = joblib.load("models/stanford40_activity_clf.pkl")
-    feature_extractor = MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(128,128,3))
-except:
-    print("Warning: Model files not found. Please ensure models/stanford40_activity_clf.pkl exists.")
-    clf = None
-    feature_extractor = None
+# Drop-shadow effects re-render their widget through a software blur on
+# every repaint, which the video frame does at playback rate
+HIGH_FPS_MODE = True
 
 # ==============================
 # Custom Styled Widgets
 # ==============================
 class StyledButton(QPushButton):
+    # size -> (width, height, font size, padding)
+    SIZES = {
+        "large": (200, 60, "18px", "15px"),
+        "medium": (150, 50, "16px", "12px"),
+        "small": (120, 40, "14px", "8px"),
+    }
+    # Stylesheets built once per (size, primary, hover) and shared by every button
+    _SHEETS = {}
+    # Temporary confirmation look, e.g. after a video is loaded
+    SUCCESS_SHEET = """
+        QPushButton {
+            background: #27AE60;
+            border: none;
+            border-radius: 25px;
+            color: white;
+            font-size: 16px;
+            font-weight: bold;
+            padding: 12px;
+        }
+    """
+
     def __init__(self, text, primary_color="#3498db", hover_color="#2980b9", size="medium"):
         super().__init__(text)
         self.primary_color = primary_color
@@ -33,20 +49,11 @@ class StyledButton(QPushButton):
         self.setup_style()
         
     def setup_style(self):
-        if self.size == "large":
-            self.setFixedSize(200, 60)
-            font_size = "18px"
-            padding = "15px"
-        elif self.size == "medium":
-            self.setFixedSize(150, 50)
-            font_size = "16px"
-            padding = "12px"
-        else:
-            self.setFixedSize(120, 40)
-            font_size = "14px"
-            padding = "8px"
-            
-        self.setStyleSheet(f"""
+        width, height, font_size, padding = self.SIZES.get(self.size, self.SIZES["small"])
+        self.setFixedSize(width, height)
+        key = (self.size, self.primary_color, self.hover_color)
+        if key not in StyledButton._SHEETS:
+            StyledButton._SHEETS[key] = f"""
             QPushButton {{
                 background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
                     stop:0 {self.primary_color}, stop:1 {self.hover_color});
@@ -67,66 +74,74 @@ class StyledButton(QPushButton):
                 background: {self.hover_color};
                 transform: translateY(1px);
             }}
-        """)
+        """
+        self.default_sheet = StyledButton._SHEETS[key]
+        self.setStyleSheet(self.default_sheet)
 
 class StyledLabel(QLabel):
+    _SHEETS = {
+        "title": """
+            QLabel {
+                font-size: 48px;
+                font-weight: bold;
+                color: qlineargradient(x1:0, y1:0, x2:1, y2:0,
+                    stop:0 #2E86C1, stop:1 #8E44AD);
+                text-align: center;
+                padding: 20px;
+            }
+        """,
+        "subtitle": """
+            QLabel {
+                font-size: 24px;
+                font-weight: bold;
+                color: #34495E;
+                text-align: center;
+                padding: 15px;
+            }
+        """,
+        "status": """
+            QLabel {
+                font-size: 18px;
+                font-weight: bold;
+                color: #2C3E50;
+                text-align: center;
+                padding: 10px;
+                background: rgba(255, 255, 255, 0.9);
+                border-radius: 15px;
+                border: 2px solid #BDC3C7;
+            }
+        """,
+    }
+
     def __init__(self, text="", style_type="normal"):
         super().__init__(text)
         self.style_type = style_type
         self.setup_style()
         
     def setup_style(self):
-        if self.style_type == "title":
-            self.setStyleSheet("""
-                QLabel {
-                    font-size: 48px;
-                    font-weight: bold;
-                    color: qlineargradient(x1:0, y1:0, x2:1, y2:0,
-                        stop:0 #2E86C1, stop:1 #8E44AD);
-                    text-align: center;
-                    padding: 20px;
-                }
-            """)
-        elif self.style_type == "subtitle":
-            self.setStyleSheet("""
-                QLabel {
-                    font-size: 24px;
-                    font-weight: bold;
-                    color: #34495E;
-                    text-align: center;
-                    padding: 15px;
-                }
-            """)
-        elif self.style_type == "status":
-            self.setStyleSheet("""
-                QLabel {
-                    font-size: 18px;
-                    font-weight: bold;
-                    color: #2C3E50;
-                    text-align: center;
-                    padding: 10px;
-                    background: rgba(255, 255, 255, 0.9);
-                    border-radius: 15px;
-                    border: 2px solid #BDC3C7;
-                }
-            """)
+        if self.style_type in self._SHEETS:
+            self.setStyleSheet(self._SHEETS[self.style_type])
 
 class VideoFrame(QFrame):
+    SHEET = """
+        QFrame {
+            border: 3px solid qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                stop:0 #3498db, stop:1 #8E44AD);
+            border-radius: 20px;
+            background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
+                stop:0 #ECF0F1, stop:1 #BDC3C7);
+            padding: 10px;
+        }
+    """
+
     def __init__(self):
         super().__init__()
         self.setup_style()
         
     def setup_style(self):
-        self.setStyleSheet("""
-            QFrame {
-                border: 3px solid qlineargradient(x1:0, y1:0, x2:1, y2:1,
-                    stop:0 #3498db, stop:1 #8E44AD);
-                border-radius: 20px;
-                background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
-                    stop:0 #ECF0F1, stop:1 #BDC3C7);
-                padding: 10px;
-            }
-        """)
+        self.setStyleSheet(self.SHEET)
+        if HIGH_FPS_MODE:
+            return
         
         # Add shadow effect
         from PyQt5.QtWidgets import QGraphicsDropShadowEffect
@@ -137,20 +152,24 @@ class VideoFrame(QFrame):
         self.setGraphicsEffect(shadow)
 
 class DashboardPanel(QFrame):
+    SHEET = """
+        QFrame {
+            background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                stop:0 rgba(52, 152, 219, 0.1), stop:1 rgba(142, 68, 173, 0.1));
+            border: 2px solid rgba(52, 152, 219, 0.3);
+            border-radius: 25px;
+            padding: 20px;
+        }
+    """
+
     def __init__(self):
         super().__init__()
         self.setup_style()
         
     def setup_style(self):
-        self.setStyleSheet("""
-            QFrame {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
-                    stop:0 rgba(52, 152, 219, 0.1), stop:1 rgba(142, 68, 173, 0.1));
-                border: 2px solid rgba(52, 152, 219, 0.3);
-                border-radius: 25px;
-                padding: 20px;
-            }
-        """)
+        self.setStyleSheet(self.SHEET)
+        if HIGH_FPS_MODE:
+            return
         
         # Add shadow effect
         from PyQt5.QtWidgets import QGraphicsDropShadowEffect
@@ -163,55 +182,147 @@ class DashboardPanel(QFrame):
 # ==============================
 # Video Processing Thread
 # ==============================
+class FrameReader(threading.Thread):
+    """Decodes every step-th frame of a video on its own thread.
+
+    (frame_number, frame) pairs go into a bounded queue, None marks the end.
+    """
+
+    def __init__(self, video_path, step=1, maxsize=32):
+        super().__init__(daemon=True)
+        self.video_path = video_path
+        self.step = step
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.stopped = threading.Event()
+
+    def run(self):
+        cap = cv2.VideoCapture(self.video_path)
+        frame_count = 0
+        while not self.stopped.is_set():
+            # grab() advances without the BGR conversion and copy, retrieve() only for sampled frames
+            if not cap.grab():
+                break
+            if frame_count % self.step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                self.put((frame_count, frame))
+            frame_count += 1
+        cap.release()
+        self.put(None)
+
+    def put(self, item):
+        # Block while the consumer is behind, but keep checking for stop()
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def stop(self):
+        self.stopped.set()
+
 class VideoProcessor(QThread):
-    frame_processed = pyqtSignal(np.ndarray, int, int)  # frame, prediction, frame_number
+    frame_processed = pyqtSignal(np.ndarray, int, int)  # display-ready RGB frame, prediction, frame_number
     processing_complete = pyqtSignal()
     
-    def __init__(self, video_path):
+    def __init__(self, video_path, batch_size=16):
         super().__init__()
         self.video_path = video_path
         self.is_running = True
+        self.batch_size = batch_size
+        # Each sampled frame is preprocessed straight into its batch slot
+        self.batch_buf = np.empty((batch_size, 128, 128, 3), dtype=np.float32)
+        self.raw_batch_buf = np.empty((batch_size, 128, 128, 3), dtype=np.uint8)
+        self.pending_frames = []
+        self.pending_indices = []
         
     def run(self):
-        cap = cv2.VideoCapture(self.video_path)
-        frame_count = 0
+        # Decoding overlaps with preprocessing and inference on this thread,
+        # and only every 5th frame is converted for processing
+        reader = FrameReader(self.video_path, step=5)
+        reader.start()
+        self.model_ready = models.wait_for_models()
         
         while self.is_running:
-            ret, frame = cap.read()
-            if not ret:
+            item = reader.frames.get()
+            if item is None:
                 break
-                
-            # Process every 5th frame for efficiency
-            if frame_count % 5 == 0:
-                try:
-                    # Preprocess frame
-                    img = cv2.resize(frame, (128, 128))
-                    x = np.expand_dims(img.astype("float32"), axis=0)
-                    x = preprocess_input(x)
-                    
-                    # Extract features and predict
-                    if clf and feature_extractor:
-                        features = feature_extractor.predict(x, verbose=0)
-                        pred = clf.predict(features)[0]
-                    else:
-                        pred = 0  # Default to idle if model not available
-                    
-                    # Emit processed frame
-                    self.frame_processed.emit(frame, pred, frame_count)
-                    
-                except Exception as e:
-                    print(f"Error processing frame {frame_count}: {e}")
-                    self.frame_processed.emit(frame, 0, frame_count)
+            frame_count, frame = item
             
-            frame_count += 1
+            try:
+                # Preprocess frame
+                slot = len(self.pending_frames)
+                if models.raw_input:
+                    # Scaling is folded into the int8 graph, only resize
+                    cv2.resize(frame, (128, 128), dst=self.raw_batch_buf[slot])
+                else:
+                    # Resize + MobileNetV2 scaling in one pass
+                    preprocess_frame(frame, self.batch_buf[slot])
+                # Colour conversion and display scaling happen here, not on the GUI thread
+                self.pending_frames.append(fit_rgb(frame, DISPLAY_SIZE))
+                self.pending_indices.append(frame_count)
+            except Exception as e:
+                print(f"Error processing frame {frame_count}: {e}")
+                self.frame_processed.emit(fit_rgb(frame, DISPLAY_SIZE), 0, frame_count)
             
-        cap.release()
+            # Run the model once per batch instead of once per frame
+            if len(self.pending_frames) == self.batch_size:
+                self.flush_batch()
+        
+        # Classify the partial batch left when the video ends
+        if self.pending_frames:
+            self.flush_batch()
+        reader.stop()
         self.processing_complete.emit()
 
+    def flush_batch(self):
+        try:
+            if self.model_ready:
+                batch = self.raw_batch_buf if models.raw_input else self.batch_buf
+                features = models.extract_features(batch[:len(self.pending_frames)])
+                preds = models.classify(features)
+            else:
+                preds = [0] * len(self.pending_frames)  # Default to idle if model not available
+        except Exception as e:
+            print(f"Error processing frames {self.pending_indices[0]}-{self.pending_indices[-1]}: {e}")
+            preds = [0] * len(self.pending_frames)
+        
+        # Emit processed frames
+        for frame, pred, index in zip(self.pending_frames, preds, self.pending_indices):
+            self.frame_processed.emit(frame, int(pred), index)
+        self.pending_frames.clear()
+        self.pending_indices.clear()
+
 # ==============================
 # MP4 Video Page
 # ==============================
 class MP4VideoPage(QWidget):
+    # Prediction stylesheets, built once and only re-applied when the label changes state
+    ACTIVE_PRED_STYLE = """
+        QLabel {
+            font-size: 24px;
+            font-weight: bold;
+            color: #27AE60;
+            background: rgba(39, 174, 96, 0.1);
+            border-radius: 20px;
+            padding: 15px;
+            border: 3px solid #27AE60;
+        }
+    """
+    IDLE_PRED_STYLE = """
+        QLabel {
+            font-size: 24px;
+            font-weight: bold;
+            color: #E74C3C;
+            background: rgba(231, 76, 60, 0.1);
+            border-radius: 20px;
+            padding: 15px;
+            border: 3px solid #E74C3C;
+        }
+    """
+
     def __init__(self, parent):
         super().__init__()
         self.parent = parent
@@ -223,6 +334,18 @@ class MP4VideoPage(QWidget):
         self.fps = 30
         self.active_count = 0
         self.idle_count = 0
+        # Idle/active predictions not yet shown in the stats labels
+        self.pending_counts = np.zeros(2, dtype=np.int64)
+        # At most one frame in flight to the inference service plus the newest one waiting
+        self.inference_pending = False
+        self.next_frame = None
+        self.pred_sheet = None
+        # Labels per frame index of the loaded video
+        self.pred_cache = {}
+        # Model input buffers, reused for every frame: with at most one frame in
+        # flight the service is done with them before the next submit_frame
+        self.small_buf = np.empty((1, 128, 128, 3), dtype=np.uint8)
+        self.input_buf = np.empty((1, 128, 128, 3), dtype=np.float32)
         self.setup_ui()
 
     def setup_ui(self):
@@ -416,6 +539,11 @@ class MP4VideoPage(QWidget):
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
 
+        # Stats labels refresh at 4 Hz instead of on every prediction
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.flush_stats)
+        self.stats_timer.start(250)
+
     def upload_video(self):
         file_name, _ = QFileDialog.getOpenFileName(
             self, 
@@ -427,26 +555,20 @@ class MP4VideoPage(QWidget):
             self.video_path = file_name
             self.load_video()
             self.upload_btn.setText("✅ Video Loaded!")
-            self.upload_btn.setStyleSheet("""
-                QPushButton {
-                    background: #27AE60;
-                    border: none;
-                    border-radius: 25px;
-                    color: white;
-                    font-size: 16px;
-                    font-weight: bold;
-                    padding: 12px;
-                }
-            """)
+            self.upload_btn.setStyleSheet(StyledButton.SUCCESS_SHEET)
             # Reset button after 2 seconds
             QTimer.singleShot(2000, lambda: self.reset_upload_button())
 
     def reset_upload_button(self):
         self.upload_btn.setText("📁 Upload Video")
-        self.upload_btn.setup_style()
+        self.upload_btn.setStyleSheet(self.upload_btn.default_sheet)
 
     def load_video(self):
         if self.video_path:
+            # Frames are analysed once the background model load has finished
+            models.load_models_async()
+            self.pred_cache = {}
+            self.next_frame = None
             self.cap = cv2.VideoCapture(self.video_path)
             if self.cap.isOpened():
                 self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -517,7 +639,7 @@ class MP4VideoPage(QWidget):
         if self.cap:
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             self.current_frame = 0
-            self.frame_slider.setValue(0)
+            self.set_slider_position(0)
             self.progress_bar.setValue(0)
             ret, frame = self.cap.read()
             if ret:
@@ -530,17 +652,26 @@ class MP4VideoPage(QWidget):
             ret, frame = self.cap.read()
             if ret:
                 self.display_frame(frame)
-                self.analyze_frame(frame)
+                self.analyze_frame(frame, frame_number)
+
+    def set_slider_position(self, frame_number):
+        # Moving the slider from code must not trigger seek_frame, which would
+        # re-read and re-analyze a frame playback already handled
+        self.frame_slider.blockSignals(True)
+        self.frame_slider.setValue(frame_number)
+        self.frame_slider.blockSignals(False)
 
     def update_frame(self):
         if self.cap and self.cap.isOpened() and self.is_playing:
             ret, frame = self.cap.read()
             if ret:
                 self.current_frame += 1
-                self.frame_slider.setValue(self.current_frame)
+                self.set_slider_position(self.current_frame)
                 self.progress_bar.setValue(self.current_frame)
                 self.display_frame(frame)
-                self.analyze_frame(frame)
+                # Classify every 5th frame, the dashboard keeps the last label in between
+                if self.current_frame % 5 == 0:
+                    self.analyze_frame(frame, int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1)
                 
                 if self.current_frame >= self.total_frames - 1:
                     self.stop_video()
@@ -548,76 +679,88 @@ class MP4VideoPage(QWidget):
                 self.stop_video()
 
     def display_frame(self, frame):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.show_rgb_frame(fit_rgb(frame, DISPLAY_SIZE))
+
+    def show_rgb_frame(self, rgb):
+        # Already display-sized RGB, so no Qt-side conversion or smooth scaling
         h, w, ch = rgb.shape
         qimg = QImage(rgb.data, w, h, ch*w, QImage.Format_RGB888)
-        pixmap = QPixmap.fromImage(qimg)
-        scaled_pixmap = pixmap.scaled(640, 480, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.video_label.setPixmap(scaled_pixmap)
+        self.video_label.setPixmap(QPixmap.fromImage(qimg))
 
-    def analyze_frame(self, frame):
-        if clf and feature_extractor:
-            try:
-                # Preprocess frame
-                img = cv2.resize(frame, (128, 128))
-                x = np.expand_dims(img.astype("float32"), axis=0)
-                x = preprocess_input(x)
-                
-                # Extract features and predict
-                features = feature_extractor.predict(x, verbose=0)
-                pred = clf.predict(features)[0]
-                
-                # Update dashboard
-                if pred == 1:  # Active
-                    self.pred_label.setText("🎯 ACTIVE WORKER ✅")
-                    self.pred_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 24px;
-                            font-weight: bold;
-                            color: #27AE60;
-                            background: rgba(39, 174, 96, 0.1);
-                            border-radius: 20px;
-                            padding: 15px;
-                            border: 3px solid #27AE60;
-                        }
-                    """)
-                    self.active_count += 1
-                else:  # Idle
-                    self.pred_label.setText("⚠️ IDLE WORKER DETECTED ❌")
-                    self.pred_label.setStyleSheet("""
-                        QLabel {
-                            font-size: 24px;
-                            font-weight: bold;
-                            color: #E74C3C;
-                            background: rgba(231, 76, 60, 0.1);
-                            border-radius: 20px;
-                            padding: 15px;
-                            border: 3px solid #E74C3C;
-                        }
-                    """)
-                    self.idle_count += 1
-                
-                # Update statistics
-                self.active_stats.setText(f"🟢 Active: {self.active_count}")
-                self.idle_stats.setText(f"🔴 Idle: {self.idle_count}")
-                
-            except Exception as e:
-                print(f"Prediction error: {e}")
-                self.pred_label.setText("❌ Prediction Error")
-                self.pred_label.setStyleSheet("""
-                    QLabel {
-                        font-size: 24px;
-                        font-weight: bold;
-                        color: #E74C3C;
-                        background: rgba(231, 76, 60, 0.1);
-                        border-radius: 20px;
-                        padding: 15px;
-                        border: 3px solid #E74C3C;
-                    }
-                """)
+    def analyze_frame(self, frame, index):
+        if index in self.pred_cache:
+            # Seen this frame before, no need to run the model again
+            self.show_prediction(self.pred_cache[index])
+        elif models.models_ready():
+            if self.inference_pending:
+                # Still classifying an earlier frame, keep only the newest one for later
+                self.next_frame = (frame, index)
+            else:
+                self.submit_frame(frame, index)
+
+    def submit_frame(self, frame, index):
+        try:
+            if models.raw_input:
+                # Scaling is folded into the int8 graph, only resize
+                x = self.small_buf
+                cv2.resize(frame, (128, 128), dst=x[0])
+            else:
+                # Resize + MobileNetV2 scaling in one pass
+                x = self.input_buf
+                preprocess_frame(frame, x[0])
+            
+            # Extract features and predict on the shared inference thread; the
+            # result is memoized for the video it came from even if another was loaded since
+            pred_cache = self.pred_cache
+            self.inference_pending = get_inference_service().submit(
+                x, lambda preds: self.on_prediction(pred_cache, index, preds))
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            self.on_prediction(self.pred_cache, index, None)
+
+    def on_prediction(self, pred_cache, index, preds):
+        self.inference_pending = False
+        if preds is not None:
+            pred_cache[index] = preds
+        self.show_prediction(preds)
+        
+        # Classify the newest frame that arrived while this one was in flight
+        if self.next_frame is not None:
+            (frame, index), self.next_frame = self.next_frame, None
+            self.submit_frame(frame, index)
+
+    def show_prediction(self, preds):
+        if preds is not None:
+            pred = preds[0]
+            # Update dashboard
+            if pred == 1:  # Active
+                self.set_prediction("🎯 ACTIVE WORKER ✅", self.ACTIVE_PRED_STYLE)
+            else:  # Idle
+                self.set_prediction("⚠️ IDLE WORKER DETECTED ❌", self.IDLE_PRED_STYLE)
+            self.pending_counts[int(pred == 1)] += 1
+        else:
+            self.set_prediction("❌ Prediction Error", self.IDLE_PRED_STYLE)
+
+    def flush_stats(self):
+        # Update statistics
+        if not self.pending_counts.any():
+            return
+        self.idle_count += int(self.pending_counts[0])
+        self.active_count += int(self.pending_counts[1])
+        self.pending_counts[:] = 0
+        self.active_stats.setText(f"🟢 Active: {self.active_count}")
+        self.idle_stats.setText(f"🔴 Idle: {self.idle_count}")
+
+    def set_prediction(self, text, sheet):
+        self.pred_label.setText(text)
+        # setStyleSheet makes Qt reparse and repolish, skip it when the sheet is unchanged
+        if sheet is not self.pred_sheet:
+            self.pred_label.setStyleSheet(sheet)
+            self.pred_sheet = sheet
 
     def closeEvent(self, event):
         if self.cap:
             self.cap.release()
         if self.timer:
             self.timer.stop()
+        self.stats_timer.stop()
@@ -1,7 +1,9 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 from sklearn.model_selection import train_test_split
+import models
 
 # Define activity categories based on the actual dataset
 idle_classes = [
@@ -15,6 +17,10 @@ active_classes = [
     "using_computer", "hammering", "pouring_liquid"
 ]
 
+# Activity name -> label (0 = idle, 1 = active)
+label_map = {c: 0 for c in idle_classes}
+label_map.update({c: 1 for c in active_classes})
+
 def load_data(dataset_dir, img_size=128):
     X, y = [], []
     
@@ -32,31 +38,38 @@ def load_data(dataset_dir, img_size=128):
     
     print(f"Found {len(image_files)} image files")
     
+    # First pass: label from filename, skipping classes we don't care about
+    paths, labels = [], []
     for img_file in image_files:
-        # Extract activity from filename (assuming format: activity_name_number.jpg)
-        activity_name = img_file.split('_')[0]  # Get first part of filename
-        
-        label = None
-        if any(idle_class in img_file.lower() for idle_class in idle_classes):
-            label = 0
-        elif any(active_class in img_file.lower() for active_class in active_classes):
-            label = 1
-        else:
-            continue  # skip classes we don't care about
-        
-        img_path = os.path.join(dataset_dir, img_file)
-        try:
-            img = cv2.imread(img_path)
-            if img is not None:
-                img = cv2.resize(img, (img_size, img_size))
-                X.append(img)
-                y.append(label)
-        except Exception as e:
-            print(f"Error processing {img_file}: {e}")
+        # Filenames are <activity>_<index>.jpg, e.g. writing_on_a_book_001.jpg
+        label = label_map.get(img_file.rsplit('_', 1)[0].lower())
+        if label is None:
             continue
+        paths.append(os.path.join(dataset_dir, img_file))
+        labels.append(label)
     
-    print(f"Successfully processed {len(X)} images")
-    return np.array(X), np.array(y)
+    # Second pass: decode + resize in parallel, OpenCV releases the GIL for both
+    X = np.empty((len(paths), img_size, img_size, 3), dtype=np.uint8)
+    y = np.empty(len(paths), dtype=np.int64)
+    n = 0
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for label, img in zip(labels, ex.map(lambda p: decode_resize(p, img_size), paths)):
+            if img is not None:
+                X[n] = img
+                y[n] = label
+                n += 1
+    
+    print(f"Successfully processed {n} images")
+    return X[:n], y[:n]
+
+def decode_resize(img_path, img_size):
+    try:
+        img = cv2.imread(img_path)
+        if img is not None:
+            return cv2.resize(img, (img_size, img_size))
+    except Exception as e:
+        print(f"Error processing {os.path.basename(img_path)}: {e}")
+    return None
 
 if __name__ == "__main__":
     dataset_path = "dataset/Standford40/JPEGImages"
@@ -64,7 +77,8 @@ if __name__ == "__main__":
     print("Dataset shape:", X.shape, y.shape)
     
     if len(X) > 0:
-        np.savez("dataset/stanford40_idle_active.npz", X=X, y=y)
+        np.save(models.DATASET_X_PATH, X)
+        np.save(models.DATASET_Y_PATH, y)
         print(f"Saved dataset with {len(X)} images")
     else:
         print("No valid images found to save")
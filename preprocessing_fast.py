@@ -0,0 +1,74 @@
+import cv2
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    print("Warning: numba not installed, falling back to OpenCV preprocessing.")
+    njit = None
+
+# ==============================
+# Fused Frame Preprocessing
+# ==============================
+# Frames stay in BGR order: the classifier was trained on cv2.imread (BGR)
+# features, so swapping channels here would shift its decision boundary.
+if njit is not None:
+    # Single-threaded on purpose: it runs on both the live worker and the MP4
+    # page's GUI thread, and numba's default workqueue threading layer aborts on
+    # concurrent parallel calls. A 128x128 output is too small to gain from
+    # threads anyway, and the cores are left to the TFLite interpreter.
+    @njit(fastmath=True, cache=True)
+    def preprocess_frame(src, dst):
+        """Bilinear-resize a uint8 BGR frame into dst and scale it to [-1, 1] in one pass."""
+        src_h, src_w = src.shape[0], src.shape[1]
+        dst_h, dst_w = dst.shape[0], dst.shape[1]
+        scale_y = src_h / dst_h
+        scale_x = src_w / dst_w
+        for i in range(dst_h):
+            # Same half-pixel centre mapping as cv2.INTER_LINEAR
+            fy = max((i + 0.5) * scale_y - 0.5, 0.0)
+            y0 = min(int(fy), src_h - 1)
+            y1 = min(y0 + 1, src_h - 1)
+            wy = fy - y0
+            for j in range(dst_w):
+                fx = max((j + 0.5) * scale_x - 0.5, 0.0)
+                x0 = min(int(fx), src_w - 1)
+                x1 = min(x0 + 1, src_w - 1)
+                wx = fx - x0
+                for c in range(3):
+                    top = src[y0, x0, c] * (1.0 - wx) + src[y0, x1, c] * wx
+                    bottom = src[y1, x0, c] * (1.0 - wx) + src[y1, x1, c] * wx
+                    v = top * (1.0 - wy) + bottom * wy
+                    dst[i, j, c] = v * (1.0 / 127.5) - 1.0
+
+    # Compile on import so the first camera frame doesn't pay the JIT cost
+    preprocess_frame(np.zeros((480, 640, 3), np.uint8), np.empty((128, 128, 3), np.float32))
+else:
+    def preprocess_frame(src, dst):
+        """Resize a uint8 BGR frame into dst and scale it to [-1, 1]."""
+        np.copyto(dst, cv2.resize(src, (dst.shape[1], dst.shape[0])), casting="unsafe")
+        dst *= 1.0 / 127.5
+        dst -= 1.0
+
+# ==============================
+# Display Frame Fitting
+# ==============================
+DISPLAY_SIZE = (640, 480)  # (w, h) of the live and MP4 video labels
+
+def fit_rgb(frame, size, dst=None):
+    """Scale a BGR frame to fit size (w, h), keeping its aspect ratio, and convert it to RGB.
+
+    dst is filled and returned when it already has the fitted shape, otherwise
+    a new array is allocated.
+    """
+    h, w = frame.shape[:2]
+    scale = min(size[0] / w, size[1] / h)
+    fitted = (max(1, round(w * scale)), max(1, round(h * scale)))
+    # Resize before the colour conversion so cvtColor touches the smaller image;
+    # INTER_AREA avoids aliasing when shrinking e.g. 1080p sources
+    if fitted != (w, h):
+        frame = cv2.resize(frame, fitted, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+    if dst is None or dst.shape != frame.shape:
+        dst = np.empty_like(frame)
+    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=dst)
+    return dst
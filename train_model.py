@@ -1,28 +1,60 @@
+import os
 import numpy as np
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.model_selection import StratifiedKFold
 import joblib
-from tensorflow.keras.applications import MobileNetV2
+from joblib import Parallel, delayed
+import tensorflow as tf
 from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
+import models
 
-# Load dataset
-data = np.load("dataset/stanford40_idle_active.npz")
-X, y = data["X"], data["y"]
+FEATURES_CACHE_PATH = "dataset/stanford40_features.npz"
 
-# Preprocess
-X = preprocess_input(X.astype("float32"))
+use_gpu = bool(tf.config.list_physical_devices("GPU"))
+# GPU float16 and CPU float32 features differ slightly, so each has its own cache
+backbone = "mobilenetv2-mixed_float16" if use_gpu else "mobilenetv2-float32"
 
-# Feature extractor (pretrained MobileNetV2, no top layer)
-base_model = MobileNetV2(weights="imagenet", include_top=False, pooling="avg", input_shape=(128,128,3))
-features = base_model.predict(X, batch_size=32, verbose=1)
+def features_cache_valid():
+    if not os.path.exists(FEATURES_CACHE_PATH):
+        return False
+    # Stale once the dataset is regenerated; with the dataset deleted the cache is all there is
+    if os.path.exists(models.DATASET_X_PATH) and os.path.getmtime(FEATURES_CACHE_PATH) < os.path.getmtime(models.DATASET_X_PATH):
+        return False
+    with np.load(FEATURES_CACHE_PATH) as cache:
+        return "backbone" in cache.files and str(cache["backbone"]) == backbone
 
-# K-Fold Cross Validation
-skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
-fold = 1
-accuracies = []
+if features_cache_valid():
+    # Features from an earlier run on the same dataset, skip MobileNetV2 entirely
+    cache = np.load(FEATURES_CACHE_PATH)
+    features, y = cache["features"], cache["y"]
+else:
+    # Load dataset, memory-mapped so the images are paged in batch by batch
+    X = np.load(models.DATASET_X_PATH, mmap_mode="r")
+    y = np.load(models.DATASET_Y_PATH)
 
-for train_index, test_index in skf.split(features, y):
+    # Feature extractor (pretrained MobileNetV2, no top layer)
+    if use_gpu:
+        # FP16 convolutions on tensor cores; half the activation memory fits larger batches
+        base_model = models.build_gpu_backbone()
+        batch_size = 128
+    else:
+        base_model = models.build_backbone()
+        batch_size = 32
+
+    # Preprocess and extract one chunk at a time, so only a chunk of float32
+    # images is ever in memory; LogisticRegression gets float32 features either way
+    chunk = 256
+    features = np.empty((len(X), base_model.output_shape[-1]), dtype=np.float32)
+    for i in range(0, len(X), chunk):
+        batch = preprocess_input(X[i:i + chunk].astype("float32"))
+        features[i:i + chunk] = base_model.predict(batch, batch_size=batch_size, verbose=0)
+        print(f"Extracted features for {min(i + chunk, len(X))}/{len(X)} images")
+    del X
+    np.savez(FEATURES_CACHE_PATH, features=features, y=y, backbone=backbone)
+
+# K-Fold Cross Validation
+def fit_fold(features, y, train_index, test_index):
     X_train, X_test = features[train_index], features[test_index]
     y_train, y_test = y[train_index], y[test_index]
     
@@ -30,12 +62,19 @@ for train_index, test_index in skf.split(features, y):
     clf.fit(X_train, y_train)
     
     y_pred = clf.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
+    return accuracy_score(y_test, y_pred), classification_report(y_test, y_pred)
+
+# Folds are independent, fit them in parallel and report in fold order. The
+# arrays are passed as arguments so joblib memory-maps them once for all workers
+skf = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+results = Parallel(n_jobs=-1)(delayed(fit_fold)(features, y, train_index, test_index)
+                              for train_index, test_index in skf.split(features, y))
+accuracies = []
+
+for fold, (acc, report) in enumerate(results, start=1):
     accuracies.append(acc)
-    
     print(f"Fold {fold} Accuracy: {acc:.4f}")
-    print(classification_report(y_test, y_pred))
-    fold += 1
+    print(report)
 
 print(f"\nAverage Accuracy across folds: {np.mean(accuracies):.4f}")
 
@@ -47,3 +86,17 @@ clf_final.fit(features, y)
 joblib.dump(clf_final, "models/stanford40_activity_clf.pkl")
 np.save("models/feature_mean.npy", features.mean(axis=0))  
 print("Final Model saved.")
+
+# INT8 feature extractor for the app, calibrated on training images and
+# checked against the new classifier before it replaces the previous one
+exported = False
+if os.path.exists(models.DATASET_X_PATH):
+    exported = models.convert_int8_extractor(clf_final)
+else:
+    # Trained from the features cache, there are no images to calibrate on
+    print(f"{models.DATASET_X_PATH} not found, skipping the INT8 feature extractor export.")
+if exported:
+    print(f"INT8 feature extractor saved to {models.INT8_TFLITE_MODEL_PATH}")
+elif os.path.exists(models.INT8_TFLITE_MODEL_PATH):
+    # The old int8 model was validated against the previous classifier
+    os.remove(models.INT8_TFLITE_MODEL_PATH)